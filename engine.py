@@ -0,0 +1,519 @@
+"""
+TrainSurf search engine - API access, availability parsing and segment stitching.
+
+Kept free of Streamlit so the same search can run inside the UI (app.py)
+and inside the standalone job service (service.py).
+"""
+import http.client
+import urllib.parse
+import json
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable, MutableMapping
+import concurrent.futures
+
+# Hook types: progress(stage, completed, total), log(level, message),
+# throttle() - called once before every upstream API call, so it also counts them
+ProgressHook = Callable[[str, int, int], None]
+LogHook = Callable[[str, str], None]
+Throttle = Callable[[], None]
+
+def http_get(path: str, params: Dict[str, str], api_key: str, host: str = "irctc1.p.rapidapi.com", timeout: int = 20) -> Dict[str, Any]:
+    """Make HTTP GET request to RapidAPI"""
+    query = "?" + urllib.parse.urlencode(params) if params else ""
+    conn = http.client.HTTPSConnection(host, timeout=timeout)
+    headers = {
+        "x-rapidapi-key": api_key,
+        "x-rapidapi-host": host,
+        "Accept": "application/json",
+        "User-Agent": "TrainSurf/2.0"
+    }
+    try:
+        conn.request("GET", f"{path}{query}", headers=headers)
+        res = conn.getresponse()
+        data = res.read()
+        text = data.decode("utf-8", errors="ignore")
+        
+        if not 200 <= res.status < 300:
+            return {"error": f"HTTP {res.status} {res.reason}", "raw_text": text[:200], "status_code": res.status}
+        
+        if not text:
+            return {"error": "empty response", "status_code": res.status}
+        
+        try:
+            return json.loads(text)
+        except Exception as e:
+            return {"error": f"JSON parse error: {str(e)}", "raw_text": text[:200], "status_code": res.status}
+    except Exception as e:
+        return {"error": f"Connection error: {str(e)}"}
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_train_details(train_no: str, api_key: str) -> Dict[str, Any]:
+    """Get train details"""
+    return http_get("/api/v1/train-details", {"trainNo": train_no}, api_key, host="irctc-train-api.p.rapidapi.com")
+
+def get_live_train_status(train_no: str, api_key: str, start_day: int = 0) -> Dict[str, Any]:
+    """Get live train status"""
+    return http_get("/api/v1/live-train-status", {"trainNo": train_no, "startDay": str(start_day)}, api_key, host="irctc-train-api.p.rapidapi.com")
+
+def check_seat_availability_raw(train_no: str, from_code: str, to_code: str, date: str, class_type: str, quota: str, api_key: str) -> Dict[str, Any]:
+    """Check seat availability for a segment - raw API call"""
+    params = {
+        "trainNo": train_no,
+        "fromStationCode": from_code,
+        "toStationCode": to_code,
+        "classType": class_type,
+        "quota": quota,
+        "date": date
+    }
+    return http_get("/api/v1/checkSeatAvailability", params, api_key)
+
+def extract_station_codes_from_train_details(details_json: Dict[str, Any]) -> List[str]:
+    """Extract station codes from train-details API"""
+    if "error" in details_json:
+        raise ValueError(f"API Error: {details_json['error']}")
+    
+    if not details_json.get("status"):
+        raise ValueError("API returned status: false")
+    
+    codes = []
+    if isinstance(details_json.get("data"), dict):
+        train_route = details_json["data"].get("trainRoute")
+        if isinstance(train_route, list):
+            for station in train_route:
+                if isinstance(station, dict):
+                    station_name = station.get("stationName", "")
+                    if " - " in station_name:
+                        parts = station_name.split(" - ")
+                        if len(parts) >= 2:
+                            code = parts[-1].strip().upper()
+                            codes.append(code)
+    
+    if codes:
+        return codes
+    raise ValueError("Could not extract station codes")
+
+def extract_station_codes_from_live_status(status_json: Dict[str, Any]) -> List[str]:
+    """Extract station codes from live-train-status API"""
+    if "error" in status_json:
+        raise ValueError(f"API Error: {status_json['error']}")
+    
+    codes = []
+    route = status_json.get("route")
+    if isinstance(route, list):
+        for station in route:
+            if isinstance(station, dict):
+                code = station.get("stationCode")
+                if code:
+                    codes.append(str(code).strip().upper())
+    
+    if codes:
+        return codes
+    raise ValueError("Could not extract station codes")
+
+def slice_route_between(codes: List[str], source: str, destination: str) -> List[str]:
+    """Slice route between source and destination"""
+    src = source.strip().upper()
+    dst = destination.strip().upper()
+    codes_upper = [c.strip().upper() for c in codes]
+    
+    try:
+        i = codes_upper.index(src)
+    except ValueError:
+        available = ', '.join(codes[:20])
+        raise ValueError(f"❌ Source '{source}' not found.\n\n**Available:** {available}")
+    
+    try:
+        j = codes_upper.index(dst)
+    except ValueError:
+        available = ', '.join(codes[:20])
+        raise ValueError(f"❌ Destination '{destination}' not found.\n\n**Available:** {available}")
+    
+    if j < i:
+        raise ValueError(f"❌ Destination before source in route")
+    
+    return codes[i:j+1]
+
+def is_available_status(status: str) -> bool:
+    """Check if status means available"""
+    if not status:
+        return False
+    
+    s = status.strip().upper()
+    
+    # Explicitly check for NOT AVAILABLE first
+    if "NOT AVAILABLE" in s or "NOT_AVAILABLE" in s:
+        return False
+    
+    # Check for confirmed/available seats
+    if "AVAILABLE" in s and "NOT" not in s:
+        if "AVAILABLE-" in s:
+            try:
+                parts = s.split("AVAILABLE-")
+                if len(parts) > 1:
+                    num = int(parts[1].split()[0])
+                    return num > 0
+            except:
+                pass
+        return True
+    
+    if "CNF" in s or "CONFIRM" in s:
+        return True
+    
+    # RAC is available
+    if "RAC" in s:
+        return True
+    
+    # Waitlist statuses are NOT available
+    if any(wl in s for wl in ["WL", "GNWL", "RLWL", "PQWL", "TQWL", "CKWL"]):
+        return False
+    
+    return False
+
+# Statuses parse_availability_for_date returns when the response held no real availability
+NON_AVAILABILITY_STATUSES = ("INVALID_RESPONSE", "API_STATUS_FALSE", "NO_DATA")
+
+def is_real_status(status: str) -> bool:
+    """Check if status came from actual availability data rather than a failed lookup"""
+    return bool(status) and not status.startswith("ERROR") and status not in NON_AVAILABILITY_STATUSES
+
+def parse_availability_for_date(resp: Dict[str, Any], target_date: str) -> Tuple[bool, str]:
+    """Parse availability JSON"""
+    if not isinstance(resp, dict):
+        return False, "INVALID_RESPONSE"
+    
+    if "error" in resp:
+        return False, f"ERROR: {resp.get('error', 'unknown')}"
+    
+    if resp.get("status") is False:
+        return False, "API_STATUS_FALSE"
+    
+    data = resp.get("data")
+    if isinstance(data, list) and len(data) > 0:
+        for row in data:
+            if isinstance(row, dict):
+                row_date = row.get("date", "")
+                if row_date == target_date:
+                    status = row.get("current_status") or row.get("currentStatus") or row.get("status")
+                    if status:
+                        status_str = str(status).strip()
+                        return is_available_status(status_str), status_str
+        
+        first = data[0]
+        if isinstance(first, dict):
+            status = first.get("current_status") or first.get("currentStatus") or first.get("status")
+            if status:
+                status_str = str(status).strip()
+                return is_available_status(status_str), status_str
+    
+    if isinstance(data, dict):
+        avail = data.get("availability")
+        if isinstance(avail, list) and len(avail) > 0:
+            for row in avail:
+                if isinstance(row, dict):
+                    row_date = row.get("date", "")
+                    if row_date == target_date:
+                        status = row.get("status") or row.get("currentStatus")
+                        if status:
+                            status_str = str(status).strip()
+                            return is_available_status(status_str), status_str
+            
+            first = avail[0]
+            if isinstance(first, dict):
+                status = first.get("status") or first.get("currentStatus")
+                if status:
+                    status_str = str(status).strip()
+                    return is_available_status(status_str), status_str
+    
+    return False, "NO_DATA"
+
+def fetch_route(train_no: str, api_key: str, throttle: Optional[Throttle] = None,
+                on_fallback: Optional[Callable[[], None]] = None) -> List[str]:
+    """Fetch station codes for a train, falling back to live status"""
+    if throttle:
+        throttle()
+    details_resp = get_train_details(train_no, api_key)
+    
+    try:
+        return extract_station_codes_from_train_details(details_resp)
+    except Exception:
+        if on_fallback:
+            on_fallback()
+        if throttle:
+            throttle()
+        status_resp = get_live_train_status(train_no, api_key)
+        return extract_station_codes_from_live_status(status_resp)
+
+def segment_cache_key(train_no: str, from_code: str, to_code: str, date: str, class_type: str, quota: str) -> str:
+    """Cache key for one segment availability lookup"""
+    return f"{train_no}|{from_code}|{to_code}|{date}|{class_type}|{quota}"
+
+def check_segment_parallel(args, cache: MutableMapping[str, Tuple[bool, str]],
+                           throttle: Optional[Throttle] = None):
+    """Wrapper for parallel segment checking, also reports whether upstream was called"""
+    train_no, from_code, to_code, date, class_type, quota, api_key = args
+    cache_key = segment_cache_key(train_no, from_code, to_code, date, class_type, quota)
+    
+    if cache_key in cache:
+        return cache_key, cache[cache_key], False
+    
+    if throttle:
+        throttle()
+    resp = check_seat_availability_raw(train_no, from_code, to_code, date, class_type, quota, api_key)
+    time.sleep(0.05)
+    
+    result = parse_availability_for_date(resp, date)
+    return cache_key, result, True
+
+def check_segment_sequential(train_no: str, from_code: str, to_code: str, date: str, 
+                             class_type: str, quota: str, api_key: str,
+                             cache: MutableMapping[str, Tuple[bool, str]],
+                             throttle: Optional[Throttle] = None) -> Tuple[bool, str]:
+    """Check segment sequentially"""
+    cache_key = segment_cache_key(train_no, from_code, to_code, date, class_type, quota)
+    
+    if cache_key in cache:
+        return cache[cache_key]
+    
+    if throttle:
+        throttle()
+    resp = check_seat_availability_raw(train_no, from_code, to_code, date, class_type, quota, api_key)
+    time.sleep(0.1)
+    
+    result = parse_availability_for_date(resp, date)
+    cache[cache_key] = result
+    
+    return result
+
+def find_all_possible_paths(route: List[str], available_segments: List[Tuple[int, int, Dict]],
+                            log: Optional[LogHook] = None) -> List[List[Dict]]:
+    """
+    Find ALL possible paths from source to destination using available segments.
+    Handles overlapping segments (e.g., if 0→7 and 6→12 exist, they can be stitched).
+    """
+    n = len(route)
+    src_idx = 0
+    dst_idx = n - 1
+    
+    if log:
+        log("write", "### 🔍 Finding ALL possible paths")
+        log("write", f"Source: {route[src_idx]} (idx {src_idx})")
+        log("write", f"Destination: {route[dst_idx]} (idx {dst_idx})")
+    
+    # Build adjacency graph
+    # A segment [from_idx, to_idx] creates a direct edge from from_idx to to_idx
+    # AND for overlap handling: if we're at any position between from_idx and to_idx-1,
+    # we can still use this segment to reach to_idx
+    graph = {i: [] for i in range(n)}
+    segment_info = {}
+    
+    for from_idx, to_idx, seg_info in available_segments:
+        # Direct connection: from from_idx to to_idx
+        graph[from_idx].append(to_idx)
+        segment_info[(from_idx, to_idx)] = seg_info
+        
+        # Overlap handling: if we're anywhere inside this segment, we can use it to reach the end
+        # Example: segment [0, 7] means if we're at positions 1,2,3,4,5,6 we can reach 7
+        for pos in range(from_idx + 1, to_idx):
+            graph[pos].append(to_idx)
+            segment_info[(pos, to_idx)] = seg_info
+    
+    if log:
+        log("write", "**Graph connections:**")
+        for pos in range(n):
+            if graph[pos]:
+                reachable = [f"{r}({route[r]})" for r in sorted(set(graph[pos]))]
+                log("write", f"  From {pos}({route[pos]}): → {', '.join(reachable)}")
+    
+    # DFS to find all paths
+    all_paths = []
+    
+    def dfs(current: int, path: List[int], visited: set):
+        if current == dst_idx:
+            # Convert to segment list
+            segments = []
+            for i in range(len(path) - 1):
+                from_pos = path[i]
+                to_pos = path[i + 1]
+                if (from_pos, to_pos) in segment_info:
+                    segments.append(segment_info[(from_pos, to_pos)])
+            if segments:
+                all_paths.append(segments)
+            return
+        
+        # Try all next positions
+        for next_pos in sorted(set(graph[current]), reverse=True):
+            if next_pos not in visited:
+                visited.add(next_pos)
+                dfs(next_pos, path + [next_pos], visited)
+                visited.remove(next_pos)
+    
+    dfs(src_idx, [src_idx], {src_idx})
+    
+    if log:
+        log("write", f"**Found {len(all_paths)} possible path(s)**")
+        for idx, path in enumerate(all_paths, 1):
+            path_str = ' → '.join([f"{seg['from']}→{seg['to']}" for seg in path])
+            log("write", f"Path {idx}: {path_str} ({len(path)} segments = {len(path)-1} transfers)")
+    
+    return all_paths
+
+def find_optimal_journey(route: List[str], train_no: str, date: str, 
+                        class_type: str, quota: str, api_key: str,
+                        cache: MutableMapping[str, Tuple[bool, str]],
+                        on_progress: Optional[ProgressHook] = None,
+                        log: Optional[LogHook] = None,
+                        throttle: Optional[Throttle] = None,
+                        max_workers: int = 20) -> Optional[List[Dict]]:
+    """
+    OPTIMIZED STRATEGY for comprehensive checking with parallel processing:
+    1. Check direct source → destination first (1 call)
+    2. Check ALL possible segments in parallel for complete coverage
+    3. Use enhanced parallel processing for maximum speed
+    
+    Progress, debug output and upstream throttling are passed in as hooks so
+    the Streamlit app and the job service can each render them their own way.
+    """
+    
+    n = len(route)
+    src_idx = 0
+    dst_idx = n - 1
+    
+    api_calls_made = 0
+    
+    def report(stage: str, completed: int = 0, total: int = 0):
+        if on_progress:
+            on_progress(stage, completed, total)
+    
+    if log:
+        log("write", f"### 🎯 Comprehensive Search Strategy")
+        log("write", f"Route: {' → '.join(route)}")
+        log("write", f"Total stations: {n}")
+    
+    # STEP 1: Check direct path first (ALWAYS - most important)
+    if log:
+        log("write", "### STEP 1: Checking direct path (Priority 1)")
+    
+    report("direct", 0, 1)
+    
+    direct_key = segment_cache_key(train_no, route[src_idx], route[dst_idx], date, class_type, quota)
+    direct_cached = direct_key in cache
+    is_avail, status = check_segment_sequential(train_no, route[src_idx], route[dst_idx], 
+                                                date, class_type, quota, api_key, cache, throttle)
+    checked_keys = {direct_key: None}
+    if not direct_cached:
+        api_calls_made += 1
+    
+    if is_avail:
+        if log:
+            log("success", f"✅ Direct available! API calls used: {api_calls_made}")
+        report("done")
+        return [{"from": route[src_idx], "to": route[dst_idx], "status": status}]
+    
+    if log:
+        log("write", f"❌ Direct not available: {status}")
+        log("write", f"API calls used: {api_calls_made}")
+    
+    # STEP 2: Check ALL possible segments
+    if log:
+        log("write", "### STEP 2: Comprehensive segment checking")
+    
+    segments_to_check = []
+    
+    # Check all possible segments
+    for i in range(src_idx, dst_idx):
+        for j in range(i + 1, dst_idx + 1):
+            segments_to_check.append((train_no, route[i], route[j], date, class_type, quota, api_key))
+    
+    total_to_check = len(segments_to_check)
+    
+    if log:
+        log("write", f"**Total segments to check: {total_to_check}**")
+    
+    report("segments", 0, total_to_check)
+    
+    # Execute checks with enhanced parallel processing
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(check_segment_parallel, seg, cache, throttle): idx for idx, seg in enumerate(segments_to_check)}
+        completed = 0
+        for future in concurrent.futures.as_completed(futures):
+            cache_key, result, called = future.result()
+            cache[cache_key] = result
+            checked_keys[cache_key] = None
+            completed += 1
+            if called:
+                api_calls_made += 1
+            if completed % 10 == 0 or completed == total_to_check:
+                report("segments", completed, total_to_check)
+    
+    if log:
+        log("info", f"**Total API calls made: {api_calls_made}**")
+    
+    # STEP 3: Collect all available segments
+    if log:
+        log("write", "### STEP 3: Collecting available segments")
+        log("write", f"Analyzing {len(checked_keys)} checked segments")
+    
+    report("analyzing")
+    
+    available_segments = []
+    unavailable_count = 0
+    
+    for cache_key in checked_keys:
+        is_avail, status = cache[cache_key]
+        parts = cache_key.split("|")
+        from_code = parts[1]
+        to_code = parts[2]
+        
+        try:
+            from_idx = route.index(from_code)
+            to_idx = route.index(to_code)
+            
+            if is_avail:
+                seg_info = {"from": from_code, "to": to_code, "status": status}
+                available_segments.append((from_idx, to_idx, seg_info))
+                
+                if log:
+                    log("write", f"✅ [{from_idx}→{to_idx}] {from_code} → {to_code} ({status})")
+            else:
+                unavailable_count += 1
+        except ValueError:
+            pass
+    
+    if log:
+        log("write", f"**Available: {len(available_segments)} | Unavailable: {unavailable_count}**")
+    
+    if not available_segments:
+        report("done")
+        return None
+    
+    # STEP 4: Find all possible paths
+    if log:
+        log("write", "### STEP 4: Finding paths with overlap detection")
+    
+    report("stitching")
+    
+    all_paths = find_all_possible_paths(route, available_segments, log)
+    
+    if not all_paths:
+        report("done")
+        return None
+    
+    # STEP 5: Select path with minimum transfers
+    if log:
+        log("write", "### STEP 5: Selecting best path")
+    
+    all_paths.sort(key=lambda x: len(x))
+    best_path = all_paths[0]
+    
+    if log:
+        log("success", f"✅ Best path: {len(best_path)} bookings, {len(best_path)-1} transfers")
+        if len(all_paths) > 1:
+            log("info", f"Found {len(all_paths)} total paths")
+    
+    report("done")
+    return best_path
+
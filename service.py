@@ -0,0 +1,696 @@
+"""
+TrainSurf search service - JSON API, job queue and worker processes.
+
+Runs find_optimal_journey outside Streamlit so many users can share one
+deployment. Jobs are queued, handed to a pool of worker processes, and every
+upstream call draws from one shared rate budget, so overload turns into
+queueing instead of 429s. Segment results are shared across workers through
+a SQLite cache file.
+
+    python service.py --workers 4 --rate-per-minute 60
+
+Endpoints:
+    POST /jobs                 submit a search, returns 202 with job_id
+    GET  /jobs/<job_id>        status and progress
+    GET  /jobs/<job_id>/result result once the job has finished
+    GET  /health               queue depth, workers and rate budget
+
+submit_job and wait_for_job are a small client for the app and other tools.
+"""
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+import engine
+
+JOB_FIELDS = ("train_no", "source", "destination", "date", "class_type", "quota")
+MAX_BODY_BYTES = 16 * 1024
+
+
+class RateLimiter:
+    """Token bucket shared by all worker processes"""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst if burst is not None else max(1.0, rate_per_minute)
+        self._lock = multiprocessing.Lock()
+        self._tokens = multiprocessing.Value("d", self.burst, lock=False)
+        self._stamp = multiprocessing.Value("d", time.monotonic(), lock=False)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens.value = min(self.burst, self._tokens.value + (now - self._stamp.value) * self.rate)
+        self._stamp.value = now
+
+    def available(self) -> float:
+        """Tokens currently in the bucket (infinite when unlimited)"""
+        if self.rate <= 0:
+            return float("inf")
+        with self._lock:
+            self._refill()
+            return self._tokens.value
+
+    def acquire(self):
+        """Block until one upstream call is allowed"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens.value >= 1:
+                    self._tokens.value -= 1
+                    return
+                wait = (1 - self._tokens.value) / self.rate
+            time.sleep(wait)
+
+
+class SqliteCache:
+    """Segment availability cache persisted in SQLite, shared between processes
+
+    Expired rows are deleted on open and then at most once per purge_interval
+    from put, so a long-running service does not grow the file without bound.
+    """
+
+    def __init__(self, path: str, ttl: float, purge_interval: float = 60):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS availability "
+            "(key TEXT PRIMARY KEY, available INTEGER, status TEXT, checked_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS availability_checked_at ON availability (checked_at)")
+        self._conn.commit()
+        self._last_purge = 0.0
+        with self._lock:
+            self._purge_expired()
+
+    def _purge_expired(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM availability WHERE checked_at < ?", (now - self.ttl,))
+        self._conn.commit()
+        self._last_purge = now
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT available, status FROM availability WHERE key = ? AND checked_at >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        return bool(row[0]), row[1]
+
+    def put(self, key: str, value: Tuple[bool, str]):
+        is_avail, status = value
+        # Failed lookups (bad key, rate limited, empty data) must not be served to other users
+        if not engine.is_real_status(status):
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO availability VALUES (?, ?, ?, ?)",
+                (key, int(is_avail), status, time.time()),
+            )
+            self._conn.commit()
+            if time.time() - self._last_purge >= self.purge_interval:
+                self._purge_expired()
+
+
+class JobCache(MutableMapping[str, Tuple[bool, str]]):
+    """Per-job view of the shared cache, so counts only cover this search"""
+
+    def __init__(self, shared: SqliteCache):
+        self.shared = shared
+        self.local: Dict[str, Tuple[bool, str]] = {}
+
+    def __contains__(self, key) -> bool:
+        if key in self.local:
+            return True
+        value = self.shared.get(key)
+        if value is None:
+            return False
+        self.local[key] = value
+        return True
+
+    def __getitem__(self, key: str) -> Tuple[bool, str]:
+        if key not in self:
+            raise KeyError(key)
+        return self.local[key]
+
+    def __setitem__(self, key: str, value: Tuple[bool, str]):
+        self.local[key] = value
+        self.shared.put(key, value)
+
+    def __delitem__(self, key: str):
+        del self.local[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.local)
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+class CallCounter:
+    """Engine throttle hook that counts upstream calls while drawing on the rate budget"""
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        self.limiter.acquire()
+
+
+def run_search(job: Dict[str, Any], cache: SqliteCache, limiter: RateLimiter,
+               on_progress: Callable[[str, int, int, int], None], max_threads: int) -> Dict[str, Any]:
+    """Fetch the route and run the search for one job
+
+    on_progress also receives the number of upstream calls made so far.
+    """
+    throttle = CallCounter(limiter)
+
+    def report(stage: str, completed: int, total: int):
+        on_progress(stage, completed, total, throttle.calls)
+
+    report("route", 0, 0)
+    station_codes = engine.fetch_route(job["train_no"], job["api_key"], throttle=throttle)
+    sliced = engine.slice_route_between(station_codes, job["source"], job["destination"])
+
+    job_cache = JobCache(cache)
+    plan = engine.find_optimal_journey(sliced, job["train_no"], job["date"], job["class_type"],
+                                       job["quota"], job["api_key"], job_cache,
+                                       on_progress=report, throttle=throttle,
+                                       max_workers=max_threads)
+
+    result = {
+        "success": bool(plan),
+        "route": sliced,
+        "plan": plan,
+        "seat_changes": len(plan) - 1 if plan else None,
+        "segments_checked": len(job_cache),
+        "upstream_calls": throttle.calls,
+        "algorithm": "TrainSurf - Smart Segment Stitching"
+    }
+    if not plan:
+        result["available_segments"] = sum(1 for v in job_cache.values() if v[0])
+    return result
+
+
+def worker_main(conn, limiter: RateLimiter, cache_path: str, cache_ttl: float, max_threads: int):
+    """Worker process loop: receive jobs on conn and send events back on it
+
+    Each worker has its own pipe, so a worker killed at any point can only
+    break its own channel, never the rest of the pool.
+    """
+    cache = SqliteCache(cache_path, cache_ttl)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id = job["job_id"]
+        conn.send((job_id, "running", None))
+
+        def on_progress(stage: str, completed: int, total: int, upstream_calls: int):
+            conn.send((job_id, "progress", {"stage": stage, "completed": completed, "total": total,
+                                            "upstream_calls": upstream_calls}))
+
+        try:
+            result = run_search(job, cache, limiter, on_progress, max_threads)
+            conn.send((job_id, "done", result))
+        except ValueError as e:
+            conn.send((job_id, "failed", str(e)))
+        except Exception as e:
+            conn.send((job_id, "failed", f"❌ Error: {str(e)}"))
+
+
+class JobManager:
+    """Job table, pending queue and dispatch to the worker pool
+
+    A queued job is only dispatched once the rate budget covers its estimated
+    upstream calls on top of the remaining demand of jobs already in flight,
+    so a saturated budget keeps jobs visibly queued. The estimate for a journey
+    is the number of upstream calls its last completed run actually made, so
+    journeys answered from the shared cache or by a direct seat are cheap;
+    admit_tokens is used until a journey has run once. In-flight demand is an
+    upper bound: the segments a job has not processed yet, cached or not.
+    One job is always let through when nothing is running.
+    """
+
+    def __init__(self, workers: int, limiter: RateLimiter, cache_path: str, cache_ttl: float,
+                 max_queue: int = 100, max_threads: int = 20, admit_tokens: float = 50,
+                 job_ttl: float = 3600):
+        self.workers = workers
+        self.limiter = limiter
+        self.max_queue = max_queue
+        self.admit_tokens = admit_tokens
+        self.job_ttl = job_ttl
+        self.job_costs: Dict[Tuple[str, str, str], float] = {}
+
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.pending: deque = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+        self._worker_args = (limiter, cache_path, cache_ttl, max_threads)
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        # Manager end of each worker's pipe (None while broken) and the job it was given
+        self.conns: List[Optional[Connection]] = [None] * workers
+        self.assigned: List[Optional[str]] = [None] * workers
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, daemon=True),
+            threading.Thread(target=self._event_loop, daemon=True),
+        ]
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for job_id in self.assigned if job_id is not None)
+
+    def _spawn(self, index: int):
+        conn, child_conn = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=worker_main, daemon=True,
+                                       args=(child_conn,) + self._worker_args)
+        proc.start()
+        child_conn.close()
+        self.processes[index] = proc
+        self.conns[index] = conn
+        self.assigned[index] = None
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        with self._lock:
+            for conn in self.conns:
+                if conn is not None:
+                    try:
+                        conn.send(None)
+                    except OSError:
+                        pass
+        for proc in self.processes:
+            if proc is not None:
+                proc.join(timeout=5)
+
+    def submit(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Queue a job, or return None when the queue is full"""
+        with self._lock:
+            if len(self.pending) >= self.max_queue:
+                return None
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "params": params,
+                "demand": 0,
+                "progress": None,
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self.pending.append(job_id)
+            position = len(self.pending)
+        self._wake.set()
+        return {"job_id": job_id, "status": "queued", "position": position}
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            view = {k: job[k] for k in ("job_id", "status", "progress", "error",
+                                        "created_at", "started_at", "finished_at")}
+            view["request"] = {k: job["params"][k] for k in JOB_FIELDS}
+            if job["status"] == "queued":
+                view["position"] = self.pending.index(job_id) + 1
+            return view
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "workers": self.workers,
+                "workers_alive": sum(1 for p in self.processes if p is not None and p.is_alive()),
+                "queued": len(self.pending),
+                "in_flight": self.in_flight,
+                "in_flight_demand": self._in_flight_demand(),
+                "jobs": counts,
+                "rate_tokens": self.limiter.available() if self.limiter.rate > 0 else None,
+            }
+
+    def _dispatch_loop(self):
+        """Hand queued jobs to idle workers while the rate budget has room"""
+        while not self._stopping:
+            self._wake.wait(timeout=0.5)
+            self._wake.clear()
+            with self._lock:
+                self._reap_workers()
+                while self.pending:
+                    idle = [i for i, conn in enumerate(self.conns)
+                            if conn is not None and self.assigned[i] is None]
+                    if not idle:
+                        break
+                    job = self.jobs[self.pending[0]]
+                    cost = self._job_cost(job["params"])
+                    headroom = self.limiter.available() - self._in_flight_demand()
+                    if self.in_flight and headroom < min(cost, self.limiter.burst):
+                        break
+                    self.pending.popleft()
+                    job["status"] = "dispatched"
+                    job["demand"] = cost
+                    self.assigned[idle[0]] = job["job_id"]
+                    try:
+                        self.conns[idle[0]].send(dict(job["params"], job_id=job["job_id"]))
+                    except OSError:
+                        # Worker died before taking the job; the reaper fails it
+                        self.conns[idle[0]] = None
+                self._purge_finished()
+
+    def _event_loop(self):
+        """Apply worker status, progress and result events to the job table"""
+        while not self._stopping:
+            with self._lock:
+                conns = [conn for conn in self.conns if conn is not None]
+            if not conns:
+                time.sleep(0.1)
+                continue
+            try:
+                ready = multiprocessing.connection.wait(conns, timeout=0.5)
+            except OSError:
+                # A pipe was closed by the reaper while we waited on it
+                continue
+            for conn in ready:
+                try:
+                    event = conn.recv()
+                except (EOFError, OSError):
+                    # Worker died; stop polling its pipe until the reaper replaces it
+                    with self._lock:
+                        if conn in self.conns:
+                            self.conns[self.conns.index(conn)] = None
+                    self._wake.set()
+                    continue
+                self._apply_event(conn, *event)
+
+    def _apply_event(self, conn: Connection, job_id: str, kind: str, payload: Any):
+        with self._lock:
+            if kind in ("done", "failed") and conn in self.conns:
+                self.assigned[self.conns.index(conn)] = None
+            job = self.jobs.get(job_id)
+            if job is not None and job["finished_at"] is None:
+                if kind == "running":
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+                elif kind == "progress":
+                    job["progress"] = payload
+                    if payload["stage"] == "segments":
+                        job["demand"] = payload["total"] - payload["completed"]
+                    elif payload["stage"] in ("analyzing", "stitching", "done"):
+                        job["demand"] = 0
+                else:
+                    if kind == "done":
+                        self.job_costs[self._journey(job["params"])] = payload["upstream_calls"]
+                    self._finish(job, kind, payload)
+            if kind in ("done", "failed"):
+                self._wake.set()
+
+    def _finish(self, job: Dict[str, Any], kind: str, payload: Any):
+        """Record a job's final state; later events for it are ignored"""
+        if job["finished_at"] is not None:
+            return
+        job["status"] = kind
+        job["finished_at"] = time.time()
+        job["demand"] = 0
+        if kind == "done":
+            job["result"] = payload
+        else:
+            job["error"] = payload
+        # The key is only needed while the job runs
+        job["params"]["api_key"] = None
+
+    @staticmethod
+    def _journey(params: Dict[str, Any]) -> Tuple[str, str, str]:
+        return params["train_no"], params["source"].upper(), params["destination"].upper()
+
+    def _job_cost(self, params: Dict[str, Any]) -> float:
+        """Estimated upstream calls for a job"""
+        return self.job_costs.get(self._journey(params), self.admit_tokens)
+
+    def _in_flight_demand(self) -> float:
+        return sum(job["demand"] for job in self.jobs.values() if job["finished_at"] is None)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained through the rate budget"""
+        if self.limiter.rate <= 0:
+            return 5
+        with self._lock:
+            backlog = self._in_flight_demand() + sum(self._job_cost(self.jobs[j]["params"]) for j in self.pending)
+        return max(1, int((backlog - self.limiter.available()) / self.limiter.rate) + 1)
+
+    def _reap_workers(self):
+        """Fail the job of any dead worker and start a replacement process"""
+        if self._stopping:
+            return
+        for index, proc in enumerate(self.processes):
+            if proc is None or proc.is_alive():
+                continue
+            job = self.jobs.get(self.assigned[index] or "")
+            if job is not None:
+                self._finish(job, "failed", f"❌ Error: worker process exited with code {proc.exitcode}")
+            if self.conns[index] is not None:
+                self.conns[index].close()
+            self._spawn(index)
+
+    def _purge_finished(self):
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API over the job manager"""
+
+    manager: JobManager
+    default_api_key: Optional[str] = None
+    server_version = "TrainSurf/2.0"
+
+    def send_json(self, code: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+
+        if parts == ["health"]:
+            self.send_json(200, self.manager.health())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            status = self.manager.status(parts[1])
+            if status is None:
+                self.send_json(404, {"error": "job not found"})
+            else:
+                self.send_json(200, status)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            job = self.manager.result(parts[1])
+            if job is None:
+                self.send_json(404, {"error": "job not found"})
+            elif job["status"] == "done":
+                self.send_json(200, job["result"])
+            elif job["status"] == "failed":
+                self.send_json(200, {"success": False, "error": job["error"]})
+            else:
+                self.send_json(409, {"error": "job not finished", "status": job["status"]})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") != "/jobs":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {"error": "invalid Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {"error": f"request body larger than {MAX_BODY_BYTES} bytes"})
+            return
+
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            self.send_json(400, {"error": f"invalid JSON: {str(e)}"})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "request body must be a JSON object"})
+            return
+
+        missing = [f for f in JOB_FIELDS if not str(body.get(f) or "").strip()]
+        if missing:
+            self.send_json(400, {"error": f"missing fields: {', '.join(missing)}"})
+            return
+        params = {f: str(body[f]).strip() for f in JOB_FIELDS}
+        params["api_key"] = body.get("api_key") or self.default_api_key
+        if not params["api_key"]:
+            self.send_json(400, {"error": "api_key is required"})
+            return
+
+        accepted = self.manager.submit(params)
+        if accepted is None:
+            self.send_json(503, {"error": "job queue is full"},
+                           headers={"Retry-After": str(self.manager.retry_after())})
+            return
+        self.send_json(202, accepted, headers={"Location": f"/jobs/{accepted['job_id']}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _request_json(method: str, url: str, body: Optional[Dict[str, Any]] = None, timeout: float = 10) -> Tuple[int, Dict[str, Any]]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return res.status, json.loads(res.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"{}")
+        except ValueError:
+            return e.code, {"error": f"HTTP {e.code}"}
+
+
+def submit_job(base_url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Client: submit a search to a running service"""
+    code, body = _request_json("POST", f"{base_url.rstrip('/')}/jobs", params)
+    if code == 503:
+        raise ValueError("⏳ TrainSurf service is busy, please try again shortly")
+    if code != 202:
+        raise ValueError(f"❌ Service error: {body.get('error', f'HTTP {code}')}")
+    return body
+
+
+def wait_for_job(base_url: str, job_id: str, on_progress: Optional[engine.ProgressHook] = None,
+                 poll_interval: float = 1.0, timeout: float = 900) -> Dict[str, Any]:
+    """Client: poll a job until it finishes and return its result
+
+    Queued jobs report stage "queued" with their queue position as completed.
+    Gives up with ValueError once timeout seconds have passed.
+    """
+    base_url = base_url.rstrip("/")
+    deadline = time.monotonic() + timeout
+    last = None
+    while True:
+        if time.monotonic() > deadline:
+            raise ValueError(f"⏳ TrainSurf service job {job_id} did not finish within {int(timeout)}s")
+        code, status = _request_json("GET", f"{base_url}/jobs/{job_id}")
+        if code != 200:
+            raise ValueError(f"❌ Service error: {status.get('error', f'HTTP {code}')}")
+        if status["status"] in ("done", "failed"):
+            break
+        if status["status"] == "queued":
+            update = ("queued", status.get("position", 0), 0)
+        elif status["progress"]:
+            update = (status["progress"]["stage"], status["progress"]["completed"], status["progress"]["total"])
+        else:
+            update = ("route", 0, 0)
+        if on_progress and update != last:
+            on_progress(*update)
+            last = update
+        time.sleep(poll_interval)
+
+    if on_progress:
+        on_progress("done", 0, 0)
+    code, result = _request_json("GET", f"{base_url}/jobs/{job_id}/result")
+    if code != 200:
+        raise ValueError(f"❌ Service error: {result.get('error', f'HTTP {code}')}")
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TrainSurf search service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=20,
+                        help="segment check threads per worker")
+    parser.add_argument("--rate-per-minute", type=float, default=60,
+                        help="upstream API calls per minute across all workers, 0 for unlimited")
+    parser.add_argument("--burst", type=float, default=None,
+                        help="rate budget burst size (default: one minute of calls)")
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="max queued jobs before new submissions get 503")
+    parser.add_argument("--admit-tokens", type=float, default=50,
+                        help="estimated upstream calls for a journey not searched before, "
+                             "used to hold jobs in the queue while the rate budget is saturated")
+    parser.add_argument("--cache-path", default="trainsurf_cache.sqlite3")
+    parser.add_argument("--cache-ttl", type=float, default=600,
+                        help="seconds a cached segment result stays valid")
+    args = parser.parse_args()
+
+    limiter = RateLimiter(args.rate_per_minute, args.burst)
+    manager = JobManager(args.workers, limiter, args.cache_path, args.cache_ttl,
+                         max_queue=args.queue_size, max_threads=args.threads,
+                         admit_tokens=args.admit_tokens)
+    manager.start()
+
+    ServiceHandler.manager = manager
+    ServiceHandler.default_api_key = os.environ.get("RAPIDAPI_KEY")
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    print(f"TrainSurf service on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.stop()
+
+
+if __name__ == "__main__":
+    main()
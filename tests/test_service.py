@@ -0,0 +1,324 @@
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import engine
+import service
+
+ROUTE = ["A", "B", "C", "D", "E"]
+AVAILABLE = {("A", "C"), ("C", "E")}
+JOB = {"train_no": "12345", "source": "A", "destination": "E", "date": "2026-11-01",
+       "class_type": "SL", "quota": "GN", "api_key": "good"}
+
+# Lock-free flag shared with forked workers, so stubbed calls can be held open
+# without deadlocking when a test kills the worker holding one
+release = multiprocessing.RawValue("b", 0)
+
+
+def fake_http_get(path, params, api_key, host="irctc1.p.rapidapi.com", timeout=20):
+    if params.get("trainNo") == "slow":
+        deadline = time.time() + 10
+        while not release.value and time.time() < deadline:
+            time.sleep(0.02)
+    if "train-details" in path:
+        return {"status": True, "data": {"trainRoute": [{"stationName": f"Station - {c}"} for c in ROUTE]}}
+    if api_key != "good":
+        # RapidAPI body for a bad key, which parses as NO_DATA
+        return {"message": "You are not subscribed to this API."}
+    seg = (params["fromStationCode"], params["toStationCode"])
+    status = "AVAILABLE-5" if seg in AVAILABLE else "GNWL12"
+    return {"data": [{"date": params["date"], "current_status": status}]}
+
+
+def wait_until(check, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def serve(manager, default_api_key=None):
+    handler = type("Handler", (service.ServiceHandler,), {"manager": manager, "default_api_key": default_api_key})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def call(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    data = body if isinstance(body, bytes) else (json.dumps(body).encode() if body is not None else None)
+    conn.request(method, path, body=data, headers=headers or {})
+    res = conn.getresponse()
+    payload = json.loads(res.read() or b"{}")
+    conn.close()
+    return res.status, payload, res
+
+
+@pytest.fixture
+def idle_manager(tmp_path):
+    """Manager whose workers are never started, so jobs stay queued"""
+    manager = service.JobManager(1, service.RateLimiter(0), str(tmp_path / "cache.sqlite3"), 600, max_queue=2)
+    server, _ = serve(manager)
+    yield manager, server
+    server.shutdown()
+
+
+@pytest.fixture
+def running_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "http_get", fake_http_get)
+    release.value = 0
+    managers = []
+
+    def start(workers=1, limiter=None, **kwargs):
+        manager = service.JobManager(workers, limiter or service.RateLimiter(0),
+                                     str(tmp_path / "cache.sqlite3"), 600, **kwargs)
+        manager.start()
+        managers.append(manager)
+        server, url = serve(manager)
+        return manager, server, url
+
+    yield start
+    release.value = 1
+    for manager in managers:
+        manager.stop()
+
+
+# ---- upstream and cache ----
+
+def test_http_get_returns_error_for_non_2xx(monkeypatch):
+    class Forbidden(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b'{"message": "You are not subscribed to this API."}'
+            self.send_response(403)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), Forbidden)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    port = upstream.server_address[1]
+    monkeypatch.setattr(engine.http.client, "HTTPSConnection",
+                        lambda host, timeout: http.client.HTTPConnection("127.0.0.1", port, timeout=timeout))
+    try:
+        resp = engine.http_get("/api/v1/checkSeatAvailability", {"trainNo": "1"}, "bad")
+    finally:
+        upstream.shutdown()
+
+    assert resp["status_code"] == 403
+    assert "error" in resp
+    assert engine.parse_availability_for_date(resp, "2026-11-01")[1].startswith("ERROR")
+
+
+def test_sqlite_cache_skips_failed_lookups(tmp_path):
+    cache = service.SqliteCache(str(tmp_path / "cache.sqlite3"), 600)
+    for i, status in enumerate(["NO_DATA", "API_STATUS_FALSE", "INVALID_RESPONSE", "ERROR: HTTP 429"]):
+        cache.put(f"bad{i}", (False, status))
+        assert cache.get(f"bad{i}") is None
+    cache.put("good", (False, "GNWL12"))
+    assert cache.get("good") == (False, "GNWL12")
+
+
+def test_sqlite_cache_expires_after_ttl(tmp_path):
+    cache = service.SqliteCache(str(tmp_path / "cache.sqlite3"), 0.2)
+    cache.put("key", (True, "AVAILABLE-5"))
+    assert cache.get("key") == (True, "AVAILABLE-5")
+    time.sleep(0.3)
+    assert cache.get("key") is None
+
+
+def test_sqlite_cache_deletes_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = service.SqliteCache(path, 0.2, purge_interval=0)
+    cache.put("old", (True, "AVAILABLE-5"))
+    time.sleep(0.3)
+    cache.put("new", (False, "GNWL12"))
+
+    rows = sqlite3.connect(path).execute("SELECT key FROM availability").fetchall()
+    assert rows == [("new",)]
+
+
+def test_job_cache_only_counts_keys_used_by_the_job(tmp_path):
+    shared = service.SqliteCache(str(tmp_path / "cache.sqlite3"), 600)
+    shared.put("seen", (True, "AVAILABLE-5"))
+    shared.put("other", (False, "GNWL1"))
+
+    view = service.JobCache(shared)
+    assert len(view) == 0
+    assert "seen" in view and view["seen"] == (True, "AVAILABLE-5")
+    assert "missing" not in view
+    view["new"] = (False, "RLWL3")
+    assert sorted(view) == ["new", "seen"]
+    assert shared.get("new") == (False, "RLWL3")
+
+
+def test_rate_limiter_blocks_once_burst_is_spent():
+    limiter = service.RateLimiter(600, burst=2)  # 10 calls per second
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+    assert time.monotonic() - start < 0.05
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.08
+    assert limiter.available() < 1
+
+
+def test_rate_limiter_unlimited():
+    limiter = service.RateLimiter(0)
+    for _ in range(100):
+        limiter.acquire()
+    assert limiter.available() == float("inf")
+
+
+# ---- HTTP routes ----
+
+def test_post_rejects_bad_requests(idle_manager):
+    _, server = idle_manager
+    assert call(server, "POST", "/jobs", {"train_no": "1"})[0] == 400
+    assert call(server, "POST", "/jobs", b"{not json", {"Content-Type": "application/json"})[0] == 400
+    assert call(server, "POST", "/jobs", [1, 2])[0] == 400
+    code, body, _ = call(server, "POST", "/jobs", dict(JOB, api_key=""))
+    assert code == 400 and body["error"] == "api_key is required"
+
+
+def test_post_rejects_bad_content_length(idle_manager):
+    _, server = idle_manager
+    for length, expected in (("-1", 400), ("abc", 400), (str(service.MAX_BODY_BYTES + 1), 413)):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        conn.putrequest("POST", "/jobs")
+        conn.putheader("Content-Length", length)
+        conn.endheaders()
+        res = conn.getresponse()
+        assert res.status == expected
+        conn.close()
+
+
+def test_unknown_routes_and_jobs_are_404(idle_manager):
+    _, server = idle_manager
+    assert call(server, "GET", "/nope")[0] == 404
+    assert call(server, "POST", "/nope", {})[0] == 404
+    assert call(server, "GET", "/jobs/missing")[0] == 404
+    assert call(server, "GET", "/jobs/missing/result")[0] == 404
+
+
+def test_queued_job_status_result_and_full_queue(idle_manager):
+    manager, server = idle_manager
+    code, first, res = call(server, "POST", "/jobs", JOB)
+    assert code == 202 and res.getheader("Location") == f"/jobs/{first['job_id']}"
+    assert call(server, "POST", "/jobs", JOB)[1]["position"] == 2
+
+    code, status, _ = call(server, "GET", f"/jobs/{first['job_id']}")
+    assert code == 200 and status["status"] == "queued" and status["position"] == 1
+    assert "api_key" not in status["request"]
+    assert call(server, "GET", f"/jobs/{first['job_id']}/result")[0] == 409
+
+    code, _, res = call(server, "POST", "/jobs", JOB)
+    assert code == 503 and int(res.getheader("Retry-After")) >= 1
+    assert call(server, "GET", "/health")[1]["queued"] == 2
+
+
+# ---- workers ----
+
+def test_job_runs_to_completion(running_service):
+    manager, server, url = running_service()
+    job = service.submit_job(url, JOB)
+    stages = []
+    result = service.wait_for_job(url, job["job_id"], on_progress=lambda s, c, t: stages.append(s), poll_interval=0.05)
+
+    assert result["success"] is True
+    assert [(s["from"], s["to"]) for s in result["plan"]] == [("A", "C"), ("C", "E")]
+    assert result["segments_checked"] == 10
+    assert stages[-1] == "done"
+    assert manager.status(job["job_id"])["status"] == "done"
+    assert manager.health()["in_flight"] == 0
+
+
+def test_bad_key_does_not_poison_cache_for_other_users(running_service):
+    _, _, url = running_service()
+    bad = service.submit_job(url, dict(JOB, api_key="bad"))
+    bad_result = service.wait_for_job(url, bad["job_id"], poll_interval=0.05)
+    assert bad_result["success"] is False
+
+    good = service.submit_job(url, JOB)
+    good_result = service.wait_for_job(url, good["job_id"], poll_interval=0.05)
+    assert good_result["success"] is True
+    assert [(s["from"], s["to"]) for s in good_result["plan"]] == [("A", "C"), ("C", "E")]
+
+
+def test_dead_worker_fails_its_job_and_is_replaced(running_service):
+    manager, _, url = running_service()
+    slow = service.submit_job(url, dict(JOB, train_no="slow"))
+    assert wait_until(lambda: manager.status(slow["job_id"])["status"] == "running")
+
+    os.kill(manager.processes[0].pid, signal.SIGKILL)
+    assert wait_until(lambda: manager.status(slow["job_id"])["status"] == "failed")
+    assert "worker process exited" in manager.status(slow["job_id"])["error"]
+
+    result = service.wait_for_job(url, service.submit_job(url, JOB)["job_id"], poll_interval=0.05)
+    assert result["success"] is True
+    health = manager.health()
+    assert health["workers_alive"] == 1 and health["in_flight"] == 0
+
+
+def test_killed_idle_worker_does_not_wedge_the_pool(running_service):
+    manager, _, url = running_service(workers=2)
+    assert wait_until(lambda: manager.health()["workers_alive"] == 2)
+    os.kill(manager.processes[0].pid, signal.SIGKILL)
+
+    jobs = [service.submit_job(url, JOB) for _ in range(3)]
+    for job in jobs:
+        assert service.wait_for_job(url, job["job_id"], poll_interval=0.05, timeout=15)["success"] is True
+    assert wait_until(lambda: manager.health()["workers_alive"] == 2)
+    assert manager.health()["in_flight"] == 0
+
+
+def test_wait_for_job_gives_up_after_timeout(idle_manager):
+    _, server = idle_manager
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    job = service.submit_job(url, JOB)
+    with pytest.raises(ValueError, match="did not finish"):
+        service.wait_for_job(url, job["job_id"], poll_interval=0.05, timeout=0.3)
+
+
+def test_job_cost_is_learned_from_upstream_calls_made(running_service):
+    manager, _, url = running_service()
+    journey = ("12345", "A", "E")
+
+    cold = service.wait_for_job(url, service.submit_job(url, JOB)["job_id"], poll_interval=0.05)
+    # Route fetch, direct check, then the 9 other segments
+    assert cold["upstream_calls"] == 11
+    assert manager.job_costs[journey] == 11
+
+    warm = service.wait_for_job(url, service.submit_job(url, JOB)["job_id"], poll_interval=0.05)
+    assert warm["upstream_calls"] == 1
+    assert manager.job_costs[journey] == 1
+
+    direct = service.wait_for_job(url, service.submit_job(url, dict(JOB, destination="C"))["job_id"],
+                                  poll_interval=0.05)
+    assert len(direct["plan"]) == 1
+    assert manager.job_costs[("12345", "A", "C")] == 1
+
+
+def test_saturated_budget_keeps_jobs_queued(running_service):
+    limiter = service.RateLimiter(60, burst=10)
+    manager, _, url = running_service(workers=2, limiter=limiter, admit_tokens=50)
+    first = service.submit_job(url, dict(JOB, train_no="slow"))
+    second = service.submit_job(url, dict(JOB, train_no="slow"))
+
+    assert wait_until(lambda: manager.status(first["job_id"])["status"] == "running")
+    time.sleep(0.3)
+    status = manager.status(second["job_id"])
+    assert status["status"] == "queued" and status["position"] == 1
+    assert manager.health()["in_flight"] == 1